@@ -21,7 +21,7 @@ from discord.ext import commands, tasks
 from discord.ext.commands import Context
 from dotenv import load_dotenv
 
-from database import DatabaseManager
+from database import DatabaseManager, migrate_echo_profile_ids
 from services.background_tasks import BackgroundTaskManager
 
 if not os.path.isfile(f"{os.path.realpath(os.path.dirname(__file__))}/config.json"):
@@ -141,6 +141,7 @@ class DiscordBot(commands.Bot):
         self.config = config
         self.database = None
         self.background_task_manager = None
+        self.ollama_warmup_task = None
         self.launch_time = datetime.now()
 
     async def init_db(self) -> None:
@@ -152,6 +153,7 @@ class DiscordBot(commands.Bot):
             ) as file:
                 await db.executescript(file.read())
             await db.commit()
+            await migrate_echo_profile_ids(db)
 
     async def load_cogs(self) -> None:
         """
@@ -221,11 +223,24 @@ class DiscordBot(commands.Bot):
                 )
                 self.background_task_manager.start_background_tasks()
                 self.logger.info("Background task manager initialized")
+                
+                # Warm up Ollama without blocking startup on a base model pull
+                self.ollama_warmup_task = asyncio.create_task(
+                    self._warmup_ollama(echo_cog.personality_engine.ollama)
+                )
             else:
                 self.logger.warning("Echo cog not found, background tasks not started")
         except Exception as e:
             self.logger.error(f"Failed to initialize background tasks: {e}")
 
+    async def _warmup_ollama(self, ollama_client) -> None:
+        """Check Ollama and the base model once on startup."""
+        is_ready, error_msg = await ollama_client.warmup()
+        if is_ready:
+            self.logger.info("Ollama is ready")
+        else:
+            self.logger.warning(f"Ollama warmup failed: {error_msg}")
+
     async def on_message(self, message: discord.Message) -> None:
         """
         The code in this event is executed every time someone sends a message, with or without the prefix
@@ -36,6 +36,9 @@ class Echo(commands.Cog, name="echo"):
             self.personality_engine.create_personality_profile
         )
 
+    async def cog_unload(self) -> None:
+        await self.personality_engine.close()
+
     @app_commands.command(
         name="analyze",
         description="Analyze a user's messages before a specified date to create an echo profile"
@@ -10,6 +10,60 @@ Version: 6.1.0
 import aiosqlite
 
 
+async def migrate_echo_profile_ids(connection: aiosqlite.Connection) -> None:
+    """
+    Convert echo_profiles.user_id/server_id from VARCHAR to INTEGER columns.
+
+    Databases created before the columns became INTEGER are rebuilt in place
+    inside a single transaction; up-to-date databases are left untouched.
+
+    :param connection: The database connection to migrate.
+    """
+    rows = await connection.execute_fetchall("PRAGMA table_info(echo_profiles)")
+    column_types = {row[1]: row[2].upper() for row in rows}
+    if column_types.get("user_id") == "INTEGER":
+        return
+
+    try:
+        await connection.executescript(
+            """
+            BEGIN;
+            DROP TABLE IF EXISTS `echo_profiles_new`;
+            CREATE TABLE `echo_profiles_new` (
+              `id` INTEGER PRIMARY KEY AUTOINCREMENT,
+              `user_id` INTEGER NOT NULL,
+              `server_id` INTEGER NOT NULL,
+              `cutoff_date` DATE NOT NULL,
+              `model_path` VARCHAR(255),
+              `training_status` VARCHAR(50) DEFAULT 'not_started',
+              `training_progress` INTEGER DEFAULT 0,
+              `total_messages` INTEGER DEFAULT 0,
+              `processed_messages` INTEGER DEFAULT 0,
+              `requester_id` VARCHAR(20) NOT NULL,
+              `started_at` TIMESTAMP,
+              `completed_at` TIMESTAMP,
+              `error_message` TEXT,
+              `created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+              `last_updated` TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+              UNIQUE(`user_id`, `server_id`)
+            );
+            INSERT INTO `echo_profiles_new`
+            SELECT `id`, CAST(`user_id` AS INTEGER), CAST(`server_id` AS INTEGER),
+                   `cutoff_date`, `model_path`, `training_status`, `training_progress`,
+                   `total_messages`, `processed_messages`, `requester_id`, `started_at`,
+                   `completed_at`, `error_message`, `created_at`, `last_updated`
+            FROM `echo_profiles`;
+            DROP TABLE `echo_profiles`;
+            ALTER TABLE `echo_profiles_new` RENAME TO `echo_profiles`;
+            CREATE INDEX IF NOT EXISTS `idx_echo_profiles_user_server` ON `echo_profiles`(`user_id`, `server_id`);
+            COMMIT;
+            """
+        )
+    except Exception:
+        await connection.rollback()
+        raise
+
+
 class DatabaseManager:
     def __init__(self, *, connection: aiosqlite.Connection) -> None:
         self.connection = connection
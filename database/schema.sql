@@ -22,8 +22,8 @@ CREATE TABLE IF NOT EXISTS `user_messages` (
 
 CREATE TABLE IF NOT EXISTS `echo_profiles` (
   `id` INTEGER PRIMARY KEY AUTOINCREMENT,
-  `user_id` VARCHAR(20) NOT NULL,
-  `server_id` VARCHAR(20) NOT NULL,
+  `user_id` INTEGER NOT NULL,
+  `server_id` INTEGER NOT NULL,
   `cutoff_date` DATE NOT NULL,
   `model_path` VARCHAR(255),
   `training_status` VARCHAR(50) DEFAULT 'not_started',
@@ -7,7 +7,8 @@ Handles local LLM communication, model management, and fine-tuning operations.
 import asyncio
 import json
 import os
-import aiofiles
+import time
+from collections import OrderedDict
 from datetime import datetime
 from typing import Dict, List, Optional, AsyncGenerator
 import ollama
@@ -15,6 +16,48 @@ from ollama import AsyncChat
 
 from utils.validation import validate_model_name, sanitize_filename
 
+# How long Ollama keeps a warmed model in memory
+_KEEP_ALIVE = '30m'
+_KEEP_ALIVE_SECONDS = 30 * 60
+
+# Ollama can only re-quantize full-precision models
+_QUANTIZABLE_LEVELS = frozenset({'F16', 'F32'})
+
+# How long the model list fetched from Ollama is reused
+_MODELS_CACHE_TTL_SECONDS = 60
+
+# Static parts of the generated Modelfile
+_MODELFILE_PREAMBLE = """FROM {base}
+
+# Model parameters
+PARAMETER temperature 0.8
+PARAMETER top_p 0.9
+PARAMETER top_k 40
+PARAMETER num_ctx 2048
+PARAMETER num_thread {num_thread}
+PARAMETER num_batch 512
+
+# System prompt for echo personality
+SYSTEM \"\"\"You are an AI assistant that mimics the communication style and personality of a specific Discord user based on their historical messages. You should:
+
+1. Match their typical response length and tone
+2. Use similar vocabulary and expressions
+3. Maintain their level of formality/informality
+4. Reflect their interests and topics they commonly discuss
+5. Respond in a way that feels natural and consistent with their personality
+
+Be conversational and engaging, but stay true to the personality you're emulating.\"\"\"
+
+"""
+
+_EXAMPLE_TEMPLATE = '''
+# Training example {i}
+TEMPLATE \"\"\"{{{{ if .System }}}}{{{{ .System }}}}
+
+{{{{ end }}}}{{{{ if .Prompt }}}}User: {{{{ .Prompt }}}}
+Assistant: {{{{ end }}}}{{{{ .Response }}}}\"\"\"
+'''
+
 
 class OllamaClient:
     """
@@ -27,12 +70,79 @@ class OllamaClient:
     - Model state management
     """
     
-    def __init__(self, host: str = "http://localhost:11434", base_model: str = "dolphin3:latest"):
+    def __init__(
+        self,
+        host: str = "http://localhost:11434",
+        base_model: str = "dolphin3:latest",
+        max_loaded_models: int = 3
+    ):
         self.host = host
         self.base_model = base_model
         self.client = ollama.AsyncClient(host=host)
-        self._loaded_models = set()
+        self.max_loaded_models = max_loaded_models
+        # Model name -> monotonic time at which Ollama's keep_alive expires,
+        # ordered from least to most recently used
+        self._loaded_models: OrderedDict[str, float] = OrderedDict()
         self._training_tasks = {}
+        self._eviction_tasks = set()
+        self._models_by_name: Optional[Dict[str, Dict]] = None
+        self._models_by_name_expires = 0.0
+    
+    async def _get_models_by_name(self) -> Dict[str, Dict]:
+        """
+        Get available models keyed by name, cached for a short TTL.
+        
+        :return: Dictionary mapping model names to model information
+        """
+        if self._models_by_name is None or time.monotonic() >= self._models_by_name_expires:
+            models = await self.client.list()
+            self._models_by_name = {model['name']: model for model in models['models']}
+            self._models_by_name_expires = time.monotonic() + _MODELS_CACHE_TTL_SECONDS
+        return self._models_by_name
+    
+    def _invalidate_models_cache(self) -> None:
+        """Force the next model lookup to query Ollama."""
+        self._models_by_name = None
+    
+    def _is_model_loaded(self, model_name: str) -> bool:
+        """Check whether a model is still within its keep_alive window."""
+        return self._loaded_models.get(model_name, 0) > time.monotonic()
+    
+    def _mark_model_loaded(self, model_name: str) -> None:
+        """
+        Record that a model was just used, evicting the least recently used
+        models from Ollama once more than max_loaded_models are held.
+        
+        Evictions run as a background task so callers never wait on them.
+        
+        :param model_name: Name of model that was loaded or used
+        """
+        now = time.monotonic()
+        self._loaded_models[model_name] = now + _KEEP_ALIVE_SECONDS
+        self._loaded_models.move_to_end(model_name)
+        
+        evicted_models = []
+        while len(self._loaded_models) > self.max_loaded_models:
+            evicted, expires_at = self._loaded_models.popitem(last=False)
+            if expires_at > now:  # Otherwise Ollama has already unloaded it
+                evicted_models.append(evicted)
+        
+        if evicted_models:
+            task = asyncio.create_task(self._evict_models(evicted_models))
+            self._eviction_tasks.add(task)
+            task.add_done_callback(self._eviction_tasks.discard)
+    
+    async def _evict_models(self, model_names: List[str]) -> None:
+        """
+        Unload models from Ollama with a zero keep_alive.
+        
+        :param model_names: Names of models to unload
+        """
+        for model_name in model_names:
+            try:
+                await self.client.generate(model=model_name, prompt='', keep_alive='0s')
+            except Exception as e:
+                print(f"Error evicting model {model_name}: {e}")
     
     async def check_ollama_availability(self) -> tuple[bool, Optional[str]]:
         """
@@ -47,6 +157,26 @@ class OllamaClient:
         except Exception as e:
             return False, f"Ollama service unavailable: {str(e)}"
     
+    async def warmup(self) -> tuple[bool, Optional[str]]:
+        """
+        Check Ollama availability and base model presence with one model list
+        request, which also primes the model list cache.
+        
+        Intended to be called once on startup; pulls the base model if missing.
+        
+        :return: Tuple of (is_ready, error_message)
+        """
+        try:
+            models_by_name = await self._get_models_by_name()
+        except Exception as e:
+            return False, f"Ollama service unavailable: {str(e)}"
+        
+        if self.base_model not in models_by_name:
+            if not await self.pull_model(self.base_model):
+                return False, f"Base model {self.base_model} could not be pulled"
+        
+        return True, None
+    
     async def ensure_base_model_available(self) -> bool:
         """
         Ensure the base model is available for fine-tuning.
@@ -54,13 +184,11 @@ class OllamaClient:
         :return: True if model is available, False otherwise
         """
         try:
-            models = await self.client.list()
-            model_names = [model['name'] for model in models['models']]
-            
-            if self.base_model not in model_names:
-                # Try to pull the base model
-                await self.pull_model(self.base_model)
+            if self.base_model in await self._get_models_by_name():
+                return True
             
+            # Try to pull the base model
+            await self.pull_model(self.base_model)
             return True
         except Exception as e:
             print(f"Error ensuring base model availability: {e}")
@@ -80,6 +208,7 @@ class OllamaClient:
             
             # Pull model asynchronously
             await self.client.pull(model_name)
+            self._invalidate_models_cache()
             return True
         except Exception as e:
             print(f"Error pulling model {model_name}: {e}")
@@ -120,7 +249,7 @@ class OllamaClient:
                 }
             
             # Create Modelfile for fine-tuning
-            modelfile_path = await self._create_modelfile(
+            modelfile_content = await self._create_modelfile(
                 model_name, dataset_path, training_config
             )
             
@@ -130,7 +259,10 @@ class OllamaClient:
                 self._training_tasks[task_key].cancel()
             
             self._training_tasks[task_key] = asyncio.create_task(
-                self._run_model_training(model_name, modelfile_path, task_key)
+                self._run_model_training(
+                    model_name, modelfile_content, task_key,
+                    training_config.get('quantize')
+                )
             )
             
             return True, model_name, None
@@ -150,92 +282,72 @@ class OllamaClient:
         :param model_name: Name of the model to create
         :param dataset_path: Path to training dataset
         :param training_config: Training configuration
-        :return: Path to created Modelfile
+        :return: Modelfile content
         """
-        # Create models directory if it doesn't exist
-        models_dir = os.path.join(os.getcwd(), "models")
-        os.makedirs(models_dir, exist_ok=True)
-        
         # Read training dataset
-        async with aiofiles.open(dataset_path, 'r', encoding='utf-8') as f:
-            dataset_content = await f.read()
-            dataset = json.loads(dataset_content)
+        dataset = await self._load_dataset_examples(dataset_path, 100)
         
         # Create Modelfile content
-        modelfile_content = f"""FROM {self.base_model}
-
-# Model parameters
-PARAMETER temperature 0.8
-PARAMETER top_p 0.9
-PARAMETER top_k 40
-PARAMETER num_ctx 2048
-
-# System prompt for echo personality
-SYSTEM \"\"\"You are an AI assistant that mimics the communication style and personality of a specific Discord user based on their historical messages. You should:
-
-1. Match their typical response length and tone
-2. Use similar vocabulary and expressions
-3. Maintain their level of formality/informality
-4. Reflect their interests and topics they commonly discuss
-5. Respond in a way that feels natural and consistent with their personality
-
-Be conversational and engaging, but stay true to the personality you're emulating.\"\"\"
-
-"""
+        parts = [_MODELFILE_PREAMBLE.format(
+            base=self.base_model,
+            num_thread=os.cpu_count() or 1
+        )]
         
         # Add training examples
-        for i, example in enumerate(dataset[:100]):  # Limit to first 100 examples
-            prompt = example.get('prompt', '')
-            response = example.get('response', '')
-            
-            if prompt and response:
-                # Escape quotes in the content
-                escaped_prompt = prompt.replace('"', '\\"').replace('\n', '\\n')
-                escaped_response = response.replace('"', '\\"').replace('\n', '\\n')
-                
-                modelfile_content += f'''
-# Training example {i+1}
-TEMPLATE \"\"\"{{{{ if .System }}}}{{{{ .System }}}}
-
-{{{{ end }}}}{{{{ if .Prompt }}}}User: {{{{ .Prompt }}}}
-Assistant: {{{{ end }}}}{{{{ .Response }}}}\"\"\"
-'''
+        for i, example in enumerate(dataset):
+            if example.get('prompt') and example.get('response'):
+                parts.append(_EXAMPLE_TEMPLATE.format(i=i + 1))
         
-        # Save Modelfile
-        modelfile_path = os.path.join(models_dir, f"{model_name}.Modelfile")
-        async with aiofiles.open(modelfile_path, 'w', encoding='utf-8') as f:
-            await f.write(modelfile_content)
+        return ''.join(parts)
+    
+    async def _load_dataset_examples(self, dataset_path: str, limit: int = 100) -> List[Dict]:
+        """
+        Load the first training examples from a dataset file.
         
-        return modelfile_path
+        Reading and parsing happen in a single worker thread hop.
+        
+        :param dataset_path: Path to training dataset
+        :param limit: Maximum number of examples to return
+        :return: List of training example dictionaries
+        """
+        return await asyncio.to_thread(self._sync_load_dataset_examples, dataset_path, limit)
+    
+    @staticmethod
+    def _sync_load_dataset_examples(dataset_path: str, limit: int) -> List[Dict]:
+        """Blocking counterpart of _load_dataset_examples."""
+        with open(dataset_path, 'r', encoding='utf-8') as f:
+            return json.load(f)[:limit]
     
     async def _run_model_training(
         self, 
         model_name: str, 
-        modelfile_path: str, 
-        task_key: str
+        modelfile_content: str, 
+        task_key: str,
+        quantize: Optional[str] = None
     ) -> bool:
         """
         Run model training process.
         
         :param model_name: Name of model to create
-        :param modelfile_path: Path to Modelfile
+        :param modelfile_content: Modelfile content
         :param task_key: Task tracking key
+        :param quantize: Quantization level for the created model (e.g. q4_K_M);
+            only applied when the base model is F16/F32
         :return: True if successful, False otherwise
         """
         try:
-            # Read Modelfile
-            async with aiofiles.open(modelfile_path, 'r', encoding='utf-8') as f:
-                modelfile_content = await f.read()
+            create_kwargs = {}
+            if quantize and await self._is_base_model_quantizable():
+                create_kwargs['quantize'] = quantize
             
             # Create model using Ollama
             await self.client.create(
                 model=model_name,
-                modelfile=modelfile_content
+                modelfile=modelfile_content,
+                **create_kwargs
             )
             
-            # Add to loaded models
-            self._loaded_models.add(model_name)
-            
+            self._invalidate_models_cache()
             return True
             
         except Exception as e:
@@ -245,12 +357,22 @@ Assistant: {{{{ end }}}}{{{{ .Response }}}}\"\"\"
             # Clean up task reference
             if task_key in self._training_tasks:
                 del self._training_tasks[task_key]
-            
-            # Clean up Modelfile
-            try:
-                os.remove(modelfile_path)
-            except OSError:
-                pass
+    
+    async def _is_base_model_quantizable(self) -> bool:
+        """
+        Check whether Ollama can quantize models built on the base model.
+        
+        Ollama only quantizes F16/F32 sources and rejects anything else.
+        
+        :return: True if the base model is F16 or F32, False otherwise
+        """
+        try:
+            info = await self.client.show(self.base_model)
+            level = info['details']['quantization_level']
+        except Exception as e:
+            print(f"Error checking quantization level of {self.base_model}: {e}")
+            return False
+        return str(level).upper() in _QUANTIZABLE_LEVELS
     
     async def load_model(self, model_name: str) -> bool:
         """
@@ -265,20 +387,18 @@ Assistant: {{{{ end }}}}{{{{ .Response }}}}\"\"\"
                 raise ValueError(error_msg)
             
             # Check if model exists
-            models = await self.client.list()
-            model_names = [model['name'] for model in models['models']]
-            
-            if model_name not in model_names:
+            if model_name not in await self._get_models_by_name():
                 return False
             
-            # Load model by making a simple request
-            await self.client.chat(
+            # Load weights into memory without generating any tokens
+            await self.client.generate(
                 model=model_name,
-                messages=[{'role': 'user', 'content': 'Hello'}],
-                stream=False
+                prompt='',
+                keep_alive=_KEEP_ALIVE,
+                options={'num_predict': 0}
             )
             
-            self._loaded_models.add(model_name)
+            self._mark_model_loaded(model_name)
             return True
             
         except Exception as e:
@@ -293,8 +413,9 @@ Assistant: {{{{ end }}}}{{{{ .Response }}}}\"\"\"
         :return: True if successful, False otherwise
         """
         try:
-            # Ollama doesn't have explicit unload, but we can track loaded models
-            self._loaded_models.discard(model_name)
+            # A zero keep_alive makes Ollama evict the model immediately
+            await self.client.generate(model=model_name, prompt='', keep_alive='0s')
+            self._loaded_models.pop(model_name, None)
             return True
         except Exception as e:
             print(f"Error unloading model {model_name}: {e}")
@@ -320,7 +441,7 @@ Assistant: {{{{ end }}}}{{{{ .Response }}}}\"\"\"
         """
         try:
             # Ensure model is loaded
-            if model_name not in self._loaded_models:
+            if not self._is_model_loaded(model_name):
                 success = await self.load_model(model_name)
                 if not success:
                     return None
@@ -347,6 +468,7 @@ Assistant: {{{{ end }}}}{{{{ .Response }}}}\"\"\"
                 model=model_name,
                 messages=messages,
                 stream=False,
+                keep_alive=_KEEP_ALIVE,
                 options={
                     'temperature': temperature,
                     'num_predict': max_tokens,
@@ -355,6 +477,8 @@ Assistant: {{{{ end }}}}{{{{ .Response }}}}\"\"\"
                 }
             )
             
+            self._mark_model_loaded(model_name)
+            
             return response['message']['content'].strip()
             
         except Exception as e:
@@ -379,7 +503,7 @@ Assistant: {{{{ end }}}}{{{{ .Response }}}}\"\"\"
         """
         try:
             # Ensure model is loaded
-            if model_name not in self._loaded_models:
+            if not self._is_model_loaded(model_name):
                 success = await self.load_model(model_name)
                 if not success:
                     return
@@ -406,6 +530,7 @@ Assistant: {{{{ end }}}}{{{{ .Response }}}}\"\"\"
                 model=model_name,
                 messages=messages,
                 stream=True,
+                keep_alive=_KEEP_ALIVE,
                 options={
                     'temperature': temperature,
                     'top_p': 0.9,
@@ -413,6 +538,8 @@ Assistant: {{{{ end }}}}{{{{ .Response }}}}\"\"\"
                 }
             )
             
+            self._mark_model_loaded(model_name)
+            
             async for chunk in stream:
                 if 'message' in chunk and 'content' in chunk['message']:
                     yield chunk['message']['content']
@@ -430,7 +557,8 @@ Assistant: {{{{ end }}}}{{{{ .Response }}}}\"\"\"
         """
         try:
             await self.client.delete(model_name)
-            self._loaded_models.discard(model_name)
+            self._invalidate_models_cache()
+            self._loaded_models.pop(model_name, None)
             return True
         except Exception as e:
             print(f"Error deleting model {model_name}: {e}")
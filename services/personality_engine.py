@@ -7,7 +7,9 @@ Handles AI model training, personality profile creation, and response generation
 import asyncio
 import random
 import re
-from datetime import datetime, timedelta
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional
 import aiosqlite
 
@@ -19,6 +21,40 @@ from utils.text_processor import (
 )
 from utils.validation import validate_discord_id
 
+# Completed-profile lookups are cached in memory for this long
+_PROFILE_CACHE_TTL_SECONDS = 60
+_PROFILE_CACHE_MAX_SIZE = 1024
+
+# Speaker labels the model sometimes prepends to its replies
+_AI_PREFIXES = (
+    "Assistant: ",
+    "AI: ",
+    "Bot: ",
+    "Echo: ",
+    "Response: "
+)
+
+# Prompt-format leftovers and refusals that disqualify a response, matched
+# case-insensitively in one scan over the lower-cased text
+_AI_ARTIFACTS = (
+    "[INST]", "[/INST]", "<|", "|>", "###", "```",
+    "I don't have", "I cannot", "As an AI", "I'm an AI"
+)
+_AI_ARTIFACT_RE = re.compile('|'.join(re.escape(a.lower()) for a in _AI_ARTIFACTS))
+
+# Fixed statement so SQLite can reuse the prepared plan on every update;
+# NULL error_message/model_path leave the stored value untouched
+_UPDATE_TRAINING_STATUS_SQL = """
+    UPDATE echo_profiles
+    SET training_status = ?,
+        training_progress = ?,
+        last_updated = ?,
+        error_message = COALESCE(?, error_message),
+        model_path = COALESCE(?, model_path),
+        completed_at = CASE WHEN ? = 'completed' THEN ? ELSE completed_at END
+    WHERE user_id = ? AND server_id = ?
+"""
+
 
 class PersonalityEngine:
     """
@@ -35,10 +71,18 @@ class PersonalityEngine:
         self.db_path = db_path
         self.config = config.get('echo', {})
         
+        # Shared database connection, opened lazily by _get_db
+        self._db: Optional[aiosqlite.Connection] = None
+        self._db_lock = asyncio.Lock()
+        
+        # (user_id, server_id) -> (expires_at, profile or None), LRU ordered
+        self._profile_cache: OrderedDict[tuple[int, int], tuple[float, Optional[Dict]]] = OrderedDict()
+        
         # Initialize Ollama client
         self.ollama = OllamaClient(
             host=self.config.get('ollama_host', 'http://localhost:11434'),
-            base_model=self.config.get('base_model', 'dolphin3:latest')
+            base_model=self.config.get('base_model', 'dolphin3:latest'),
+            max_loaded_models=self.config.get('max_loaded_models', 3)
         )
         
         # Response generation settings
@@ -46,6 +90,30 @@ class PersonalityEngine:
         self.response_delay_min = self.config.get('response_delay_min', 1.0)
         self.response_delay_max = self.config.get('response_delay_max', 5.0)
         self.conversation_initiation_chance = self.config.get('conversation_initiation_chance', 0.1)
+        
+        # Per-instance RNG for all response decisions
+        self._rng = random.Random()
+    
+    async def _get_db(self) -> aiosqlite.Connection:
+        """Get the shared database connection, opening it on first use."""
+        if self._db is None:
+            async with self._db_lock:
+                if self._db is None:
+                    db = await aiosqlite.connect(self.db_path)
+                    await db.executescript("""
+                        PRAGMA journal_mode=WAL;
+                        PRAGMA synchronous=NORMAL;
+                        PRAGMA temp_store=MEMORY;
+                        PRAGMA cache_size=-64000;
+                    """)
+                    self._db = db
+        return self._db
+    
+    async def close(self) -> None:
+        """Close the shared database connection."""
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
     
     async def create_personality_profile(
         self, 
@@ -67,20 +135,24 @@ class PersonalityEngine:
             if not is_available:
                 raise Exception(f"Ollama service not available: {error_msg}")
             
-            # Ensure base model is available
-            base_available = await self.ollama.ensure_base_model_available()
-            if not base_available:
-                raise Exception("Base model not available for fine-tuning")
-            
-            # Update database status to training
-            await self._update_training_status(
-                user_id, server_id, 'training', 0, "Starting model training..."
+            # Ensure base model is available while marking training as started
+            base_available, status_error = await asyncio.gather(
+                self.ollama.ensure_base_model_available(),
+                self._update_training_status(
+                    user_id, server_id, 'training', 0, "Starting model training..."
+                ),
+                return_exceptions=True
             )
+            if isinstance(status_error, Exception):
+                raise status_error
+            if base_available is not True:
+                raise Exception("Base model not available for fine-tuning")
             
             # Create fine-tuned model
             training_config = {
                 "epochs": self.config.get('training_epochs', 10),
-                "batch_size": self.config.get('batch_size', 4)
+                "batch_size": self.config.get('batch_size', 4),
+                "quantize": self.config.get('quantize')
             }
             
             success, model_name, error_message = await self.ollama.create_fine_tuned_model(
@@ -110,13 +182,14 @@ class PersonalityEngine:
                 user_id, server_id, 'completed', 100, None, model_name
             )
             
+            now = datetime.now()
             return {
                 "user_id": user_id,
                 "server_id": server_id,
                 "model_name": model_name,
                 "training_status": "completed",
-                "created_at": datetime.now(),
-                "last_updated": datetime.now()
+                "created_at": now,
+                "last_updated": now
             }
             
         except Exception as e:
@@ -135,37 +208,17 @@ class PersonalityEngine:
         model_name: str = None
     ) -> None:
         """Update training status in database."""
-        async with aiosqlite.connect(self.db_path) as db:
-            update_fields = [
-                "training_status = ?",
-                "training_progress = ?",
-                "last_updated = ?"
-            ]
-            update_values = [status, progress, datetime.now()]
-            
-            if error_message is not None:
-                update_fields.append("error_message = ?")
-                update_values.append(error_message)
-            
-            if model_name:
-                update_fields.append("model_path = ?")
-                update_values.append(model_name)
-            
-            if status == 'completed':
-                update_fields.append("completed_at = ?")
-                update_values.append(datetime.now())
-            
-            # Add WHERE clause parameters
-            update_values.extend([str(user_id), str(server_id)])
-            
-            query = f"""
-                UPDATE echo_profiles 
-                SET {', '.join(update_fields)}
-                WHERE user_id = ? AND server_id = ?
-            """
-            
-            await db.execute(query, update_values)
-            await db.commit()
+        now = datetime.now()
+        db = await self._get_db()
+        await db.execute(_UPDATE_TRAINING_STATUS_SQL, (
+            status, progress, now,
+            error_message, model_name or None,
+            status, now,
+            user_id, server_id
+        ))
+        await db.commit()
+        
+        self._profile_cache.pop((user_id, server_id), None)
     
     async def _test_model(self, model_name: str) -> bool:
         """Test the fine-tuned model."""
@@ -176,17 +229,27 @@ class PersonalityEngine:
                 "How was your day?"
             ]
             
-            for prompt in test_prompts:
-                response = await self.ollama.generate_response(
+            # Run the prompts concurrently; the first bad answer cancels the rest
+            tasks = [
+                asyncio.create_task(self.ollama.generate_response(
                     model_name, prompt, max_tokens=50, temperature=0.7
-                )
-                
-                if not response:
-                    return False
-                
-                # Basic validation
-                if not self.validate_model_response(response):
-                    return False
+                ))
+                for prompt in test_prompts
+            ]
+            
+            try:
+                for next_response in asyncio.as_completed(tasks):
+                    response = await next_response
+                    
+                    if not response:
+                        return False
+                    
+                    # Basic validation
+                    if not self.validate_model_response(response):
+                        return False
+            finally:
+                for task in tasks:
+                    task.cancel()
             
             return True
             
@@ -202,28 +265,45 @@ class PersonalityEngine:
         :param server_id: Discord server ID
         :return: Profile dictionary or None if not found
         """
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute("""
-                SELECT id, user_id, server_id, model_path, training_status, 
-                       created_at, last_updated, total_messages
-                FROM echo_profiles 
-                WHERE user_id = ? AND server_id = ? AND training_status = 'completed'
-            """, (str(user_id), str(server_id)))
-            
-            result = await cursor.fetchone()
-            if not result:
-                return None
-            
-            return {
-                "profile_id": result[0],
-                "user_id": result[1],
-                "server_id": result[2],
-                "model_name": result[3],
-                "training_status": result[4],
-                "created_at": result[5],
-                "last_updated": result[6],
-                "total_messages": result[7]
-            }
+        key = (user_id, server_id)
+        cached = self._profile_cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            self._profile_cache.move_to_end(key)
+            return cached[1]
+        
+        profile = await self._fetch_personality_profile(user_id, server_id)
+        
+        self._profile_cache[key] = (time.monotonic() + _PROFILE_CACHE_TTL_SECONDS, profile)
+        self._profile_cache.move_to_end(key)
+        if len(self._profile_cache) > _PROFILE_CACHE_MAX_SIZE:
+            self._profile_cache.popitem(last=False)
+        
+        return profile
+    
+    async def _fetch_personality_profile(self, user_id: int, server_id: int) -> Optional[Dict]:
+        """Load a completed personality profile from the database."""
+        db = await self._get_db()
+        rows = await db.execute_fetchall("""
+            SELECT id, user_id, server_id, model_path, training_status, 
+                   created_at, last_updated, total_messages
+            FROM echo_profiles 
+            WHERE user_id = ? AND server_id = ? AND training_status = 'completed'
+        """, (user_id, server_id))
+        
+        if not rows:
+            return None
+        
+        result = rows[0]
+        return {
+            "profile_id": result[0],
+            "user_id": result[1],
+            "server_id": result[2],
+            "model_name": result[3],
+            "training_status": result[4],
+            "created_at": result[5],
+            "last_updated": result[6],
+            "total_messages": result[7]
+        }
     
     async def generate_response(
         self, 
@@ -315,17 +395,10 @@ class PersonalityEngine:
         response = normalize_whitespace(response)
         
         # Remove common AI prefixes
-        prefixes_to_remove = [
-            "Assistant: ",
-            "AI: ",
-            "Bot: ",
-            "Echo: ",
-            "Response: "
-        ]
-        
-        for prefix in prefixes_to_remove:
-            if response.startswith(prefix):
-                response = response[len(prefix):].strip()
+        if response.startswith(_AI_PREFIXES):
+            for prefix in _AI_PREFIXES:
+                if response.startswith(prefix):
+                    response = response[len(prefix):].strip()
         
         # Truncate if too long
         response = truncate_content(response, self.max_response_length)
@@ -356,51 +429,73 @@ class PersonalityEngine:
                 return False
             
             last_message = channel_history[-1]
+            uid = str(user_id)
             
             # Don't respond to own messages or bot messages
-            if last_message.get('author_id') == str(user_id):
+            if last_message.get('author_id') == uid:
                 return False
             
             if last_message.get('is_bot', False):
                 return False
             
+            # Users without a completed profile can't respond at all
+            if await self.get_personality_profile(user_id, server_id) is None:
+                return False
+            
             # Check if mentioned
             mentions = last_message.get('mentions', [])
-            if str(user_id) in mentions:
+            if uid in mentions:
                 return True
             
-            # Check time since last message
-            last_message_time = last_message.get('timestamp')
-            if last_message_time:
-                try:
-                    if isinstance(last_message_time, str):
-                        last_time = datetime.fromisoformat(last_message_time.replace('Z', '+00:00'))
-                    else:
-                        last_time = last_message_time
-                    
-                    time_diff = (datetime.now() - last_time).total_seconds()
-                    
-                    # Don't respond immediately
-                    if time_diff < 10:
-                        return False
-                    
-                    # Higher chance to respond to recent messages
-                    if time_diff < 300:  # 5 minutes
-                        return random.random() < 0.3
-                    
-                except (ValueError, TypeError):
-                    pass
+            # Higher chance to respond while the conversation is active. The gap
+            # is measured between the last two messages, since the last one has
+            # only just arrived; the caller already waits get_response_timing()
+            # before replying, so there is no separate "too soon" check.
+            if len(channel_history) >= 2:
+                last_time = self._message_time(last_message)
+                previous_time = self._message_time(channel_history[-2])
+                if last_time and previous_time:
+                    if (last_time - previous_time).total_seconds() < 300:  # 5 minutes
+                        return self._rng.random() < 0.3
             
             # Random chance to respond based on conversation activity
             activity_score = min(len(channel_history), 10) / 10.0
             base_chance = 0.1 * activity_score
             
-            return random.random() < base_chance
+            return self._rng.random() < base_chance
             
         except Exception as e:
             print(f"Error determining if should respond: {e}")
             return False
     
+    @staticmethod
+    def _message_time(message: Dict) -> Optional[datetime]:
+        """
+        Get a message timestamp as an aware UTC datetime.
+        
+        :param message: Message dictionary with an optional 'timestamp'
+        :return: Timestamp, or None if missing or unparseable
+        """
+        timestamp = message.get('timestamp')
+        if not timestamp:
+            return None
+        
+        try:
+            if isinstance(timestamp, str):
+                if timestamp.endswith('Z'):
+                    timestamp = timestamp[:-1] + '+00:00'
+                timestamp = datetime.fromisoformat(timestamp)
+        except ValueError:
+            return None
+        
+        if not isinstance(timestamp, datetime):
+            return None
+        
+        # Discord timestamps are UTC; treat naive values the same way
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return timestamp
+    
     async def get_response_timing(self, user_id: int, server_id: int) -> float:
         """
         Calculate natural response timing for the user.
@@ -410,10 +505,10 @@ class PersonalityEngine:
         :return: Delay in seconds before responding
         """
         # Base delay with some randomness
-        base_delay = random.uniform(self.response_delay_min, self.response_delay_max)
+        base_delay = self._rng.uniform(self.response_delay_min, self.response_delay_max)
         
         # Add typing simulation delay
-        typing_delay = random.uniform(1.0, 3.0)
+        typing_delay = self._rng.uniform(1.0, 3.0)
         
         return base_delay + typing_delay
     
@@ -433,7 +528,7 @@ class PersonalityEngine:
         """
         try:
             # Check if we should initiate conversation
-            if random.random() > self.conversation_initiation_chance:
+            if self._rng.random() > self.conversation_initiation_chance:
                 return None
             
             # Get recent channel activity to avoid interrupting
@@ -451,7 +546,7 @@ class PersonalityEngine:
                 "Begin a conversation in your typical style."
             ]
             
-            prompt = random.choice(starter_prompts)
+            prompt = self._rng.choice(starter_prompts)
             
             response = await self.ollama.generate_response(
                 model_name=profile['model_name'],
@@ -505,23 +600,23 @@ class PersonalityEngine:
         if len(response.strip()) < 2:
             return False
         
-        # Check for excessive repetition
+        # Check for excessive repetition (less than 30% unique words), stopping
+        # as soon as enough distinct words have been seen
         words = response.split()
-        if len(words) > 1:
-            unique_words = set(words)
-            if len(unique_words) / len(words) < 0.3:  # Less than 30% unique words
+        word_count = len(words)
+        if word_count > 1:
+            needed = (word_count * 3 + 9) // 10  # ceil(0.3 * word_count)
+            seen = set()
+            for word in words:
+                seen.add(word)
+                if len(seen) >= needed:
+                    break
+            else:
                 return False
         
         # Check for common AI artifacts
-        ai_artifacts = [
-            "[INST]", "[/INST]", "<|", "|>", "###", "```",
-            "I don't have", "I cannot", "As an AI", "I'm an AI"
-        ]
-        
-        response_lower = response.lower()
-        for artifact in ai_artifacts:
-            if artifact.lower() in response_lower:
-                return False
+        if _AI_ARTIFACT_RE.search(response.lower()):
+            return False
         
         return True
     
@@ -533,30 +628,30 @@ class PersonalityEngine:
         :param server_id: Discord server ID
         :return: Dictionary containing training status information
         """
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute("""
-                SELECT training_status, training_progress, started_at, 
-                       completed_at, error_message, model_path
-                FROM echo_profiles 
-                WHERE user_id = ? AND server_id = ?
-            """, (str(user_id), str(server_id)))
-            
-            result = await cursor.fetchone()
-            if not result:
-                return {
-                    "status": "not_started",
-                    "progress": 0,
-                    "started_at": None,
-                    "completed_at": None,
-                    "error_message": None,
-                    "model_path": None
-                }
-            
+        db = await self._get_db()
+        rows = await db.execute_fetchall("""
+            SELECT training_status, training_progress, started_at, 
+                   completed_at, error_message, model_path
+            FROM echo_profiles 
+            WHERE user_id = ? AND server_id = ?
+        """, (user_id, server_id))
+        
+        if not rows:
             return {
-                "status": result[0] or "not_started",
-                "progress": result[1] or 0,
-                "started_at": result[2],
-                "completed_at": result[3],
-                "error_message": result[4],
-                "model_path": result[5]
-            }
\ No newline at end of file
+                "status": "not_started",
+                "progress": 0,
+                "started_at": None,
+                "completed_at": None,
+                "error_message": None,
+                "model_path": None
+            }
+        
+        result = rows[0]
+        return {
+            "status": result[0] or "not_started",
+            "progress": result[1] or 0,
+            "started_at": result[2],
+            "completed_at": result[3],
+            "error_message": result[4],
+            "model_path": result[5]
+        }
\ No newline at end of file
@@ -28,6 +28,12 @@ def parse_flexible_date(date_string: str) -> Optional[datetime]:
     :param date_string: Date string to parse
     :return: Parsed datetime object or None if parsing fails
     """
+    # ISO 8601 strings take the fast C parser; dateutil handles everything else
+    try:
+        return datetime.fromisoformat(date_string)
+    except (ValueError, TypeError):
+        pass
+    
     try:
         return dateutil_parser.parse(date_string)
     except (ValueError, TypeError):
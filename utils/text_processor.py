@@ -3,10 +3,50 @@ Text processing utilities for Echo bot.
 """
 
 import re
-from typing import List, Optional
+from typing import Dict, List, Optional
 from urllib.parse import urlparse
 
 
+_MENTION_USER_RE = re.compile(r'<@!?(\d+)>')
+_MENTION_ROLE_RE = re.compile(r'<@&(\d+)>')
+_MENTION_CHAN_RE = re.compile(r'<#(\d+)>')
+# A single character class; the '$-_' range already covers digits, upper-case
+# letters, '%' and the punctuation URLs contain
+_URL_CHARS = r'[!$-_a-z]'
+_URL_RE = re.compile(r'https?://' + _URL_CHARS + r'+')
+_WS_RE = re.compile(r'\s+')
+_NONWORD_RE = re.compile(r'[^\w\s]')
+# Deletes every ASCII character matched by [^\w\s]
+_ASCII_NONWORD_TABLE = str.maketrans('', '', ''.join(
+    c for c in map(chr, range(128))
+    if not (c.isalnum() or c == '_' or c.isspace())
+))
+_TOKEN_RE = re.compile(r'\b\w+\b|[^\w\s]')
+
+# Everything clean_discord_content replaces, matched in a single pass. A URL
+# swallows whole mentions and emojis glued to it, just as it swallowed their
+# placeholders when each pattern was substituted in turn.
+_DISCORD_TOKEN = r'<@[!&]?\d+>|<#\d+>|<a?:\w+:\d+>'
+_CLEAN_RE = re.compile(
+    r'(?P<user><@!?\d+>)'
+    r'|(?P<role><@&\d+>)'
+    r'|(?P<chan><#\d+>)'
+    r'|(?P<emoji><a?:\w+:\d+>)'
+    r'|(?P<url>https?://(?:' + _DISCORD_TOKEN + r'|' + _URL_CHARS + r')+)'
+)
+_CLEAN_REPLACEMENTS = {
+    'user': '[USER]',
+    'role': '[ROLE]',
+    'chan': '[CHANNEL]',
+    'emoji': '[EMOJI]',
+    'url': '[URL]',
+}
+
+
+def _clean_replacement(match: re.Match) -> str:
+    return _CLEAN_REPLACEMENTS[match.lastgroup]
+
+
 def clean_discord_content(content: str) -> str:
     """
     Clean Discord message content for AI training.
@@ -17,24 +57,29 @@ def clean_discord_content(content: str) -> str:
     if not content:
         return ""
     
-    # Remove Discord mentions
-    content = re.sub(r'<@!?(\d+)>', '[USER]', content)
-    content = re.sub(r'<@&(\d+)>', '[ROLE]', content)
-    content = re.sub(r'<#(\d+)>', '[CHANNEL]', content)
-    
-    # Remove Discord emojis
-    content = re.sub(r'<a?:\w+:\d+>', '[EMOJI]', content)
-    
-    # Clean URLs but keep some context
-    content = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '[URL]', content)
+    # Replace Discord mentions, emojis and URLs with placeholders
+    content = _CLEAN_RE.sub(_clean_replacement, content)
     
     # Remove multiple whitespaces and normalize
-    content = re.sub(r'\s+', ' ', content)
+    content = _WS_RE.sub(' ', content)
     content = content.strip()
     
     return content
 
 
+def count_word_chars(content: str) -> int:
+    """
+    Count the word and whitespace characters in content.
+    
+    :param content: Text content
+    :return: Number of characters not matched by [^\w\s]
+    """
+    if content.isascii():
+        # Common case: let a C-level translate() do the counting
+        return len(content.translate(_ASCII_NONWORD_TABLE))
+    return len(_NONWORD_RE.sub('', content))
+
+
 def is_valid_message_content(content: str) -> bool:
     """
     Check if message content is valid for training.
@@ -50,7 +95,7 @@ def is_valid_message_content(content: str) -> bool:
         return False
     
     # Skip messages that are mostly special characters
-    if len(re.sub(r'[^\w\s]', '', content)) < len(content) * 0.3:
+    if count_word_chars(content) < len(content) * 0.3:
         return False
     
     # Skip bot commands (starting with common prefixes)
@@ -60,19 +105,42 @@ def is_valid_message_content(content: str) -> bool:
     return True
 
 
-def extract_conversation_context(messages: List[dict], target_message_id: str, context_size: int = 5) -> List[dict]:
+def build_message_index(messages: List[dict]) -> Dict[str, int]:
+    """
+    Map message IDs to their position in a message list.
+    
+    :param messages: List of message dictionaries
+    :return: Dictionary of message_id -> index of its first occurrence
+    """
+    index = {}
+    for i, msg in enumerate(messages):
+        index.setdefault(msg.get('message_id'), i)
+    return index
+
+
+def extract_conversation_context(
+    messages: List[dict],
+    target_message_id: str,
+    context_size: int = 5,
+    index: Optional[Dict[str, int]] = None
+) -> List[dict]:
     """
     Extract conversation context around a target message.
     
     :param messages: List of message dictionaries
     :param target_message_id: ID of the target message
     :param context_size: Number of messages to include before and after
+    :param index: Optional index from build_message_index, for repeated lookups
     :return: List of context messages
     """
-    try:
-        target_index = next(i for i, msg in enumerate(messages) if msg.get('message_id') == target_message_id)
-    except StopIteration:
-        return []
+    target_index = index.get(target_message_id) if index is not None else None
+    if target_index is None:
+        target_index = next(
+            (i for i, msg in enumerate(messages) if msg.get('message_id') == target_message_id),
+            None
+        )
+        if target_index is None:
+            return []
     
     start_index = max(0, target_index - context_size)
     end_index = min(len(messages), target_index + context_size + 1)
@@ -87,9 +155,8 @@ def tokenize_for_training(content: str) -> List[str]:
     :param content: Text content to tokenize
     :return: List of tokens
     """
-    # Basic word tokenization
-    tokens = re.findall(r'\b\w+\b|[^\w\s]', content.lower())
-    return [token for token in tokens if token.strip()]
+    # Basic word tokenization; the pattern never yields whitespace-only tokens
+    return _TOKEN_RE.findall(content.lower())
 
 
 def estimate_reading_time(content: str, words_per_minute: int = 200) -> float:
@@ -116,13 +183,12 @@ def truncate_content(content: str, max_length: int = 2000) -> str:
         return content
     
     # Try to truncate at sentence boundary
-    truncated = content[:max_length]
-    last_sentence = truncated.rfind('. ')
+    last_sentence = content.rfind('. ', 0, max_length)
     
     if last_sentence > max_length * 0.7:  # If we can keep at least 70% of content
-        return truncated[:last_sentence + 1]
+        return content[:last_sentence + 1]
     else:
-        return truncated[:max_length - 3] + "..."
+        return content[:max_length - 3] + "..."
 
 
 def extract_mentions(content: str) -> dict:
@@ -132,9 +198,9 @@ def extract_mentions(content: str) -> dict:
     :param content: Message content
     :return: Dictionary with extracted mentions
     """
-    users = re.findall(r'<@!?(\d+)>', content)
-    roles = re.findall(r'<@&(\d+)>', content)
-    channels = re.findall(r'<#(\d+)>', content)
+    users = _MENTION_USER_RE.findall(content)
+    roles = _MENTION_ROLE_RE.findall(content)
+    channels = _MENTION_CHAN_RE.findall(content)
     
     return {
         'users': users,
@@ -150,8 +216,7 @@ def contains_url(content: str) -> bool:
     :param content: Content to check
     :return: True if contains URLs, False otherwise
     """
-    url_pattern = r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
-    return bool(re.search(url_pattern, content))
+    return 'http' in content and _URL_RE.search(content) is not None
 
 
 def normalize_whitespace(content: str) -> str:
@@ -162,6 +227,6 @@ def normalize_whitespace(content: str) -> str:
     :return: Normalized content
     """
     # Replace multiple whitespaces with single space
-    content = re.sub(r'\s+', ' ', content)
+    content = _WS_RE.sub(' ', content)
     # Remove leading/trailing whitespace
     return content.strip()
\ No newline at end of file
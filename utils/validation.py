@@ -2,11 +2,54 @@
 Validation utilities for Echo bot.
 """
 
-import re
+import string
 from datetime import datetime
+from functools import lru_cache
 from typing import Optional
 import discord
 
+from utils.text_processor import count_word_chars
+
+
+# Model names start and end with an ASCII letter or digit; the body may
+# also contain '.', '_' and '-'
+_MODEL_NAME_EDGE_CHARS = frozenset(string.ascii_letters + string.digits)
+_MODEL_NAME_BODY_CHARS = _MODEL_NAME_EDGE_CHARS | frozenset('._-')
+
+# Discord's launch year; earlier cutoff dates can't contain messages
+_MIN_DATE = datetime(2015, 1, 1)
+_now = datetime.now
+
+# Either permission lets a member analyze other users
+_ANALYZE_OTHERS_PERMISSIONS = discord.Permissions(
+    administrator=True,
+    manage_messages=True
+).value
+
+# Permissions the bot needs in every channel it reads or talks in
+_REQUIRED_CHANNEL_PERMISSIONS = discord.Permissions(
+    read_messages=True,
+    send_messages=True,
+    read_message_history=True,
+    embed_links=True
+).value
+
+# (attribute, display name) pairs for reporting missing channel permissions
+_REQUIRED_CHANNEL_PERMISSION_NAMES = (
+    ('read_messages', 'Read Messages'),
+    ('send_messages', 'Send Messages'),
+    ('read_message_history', 'Read Message History'),
+    ('embed_links', 'Embed Links'),
+)
+
+_join_names = ', '.join
+
+_SESSION_LIMIT_ERROR = "Maximum number of active sessions ({}) reached for this server"
+_TOO_FEW_MESSAGES_ERROR = "Insufficient messages for training. Found {}, need at least {}"
+_TOO_MANY_MESSAGES_ERROR = "Too many messages for training. Found {}, maximum is {}"
+
+_FILENAME_TRANS = str.maketrans({c: '_' for c in '<>:"/\\|?*'})
+
 
 def validate_discord_id(discord_id: str) -> bool:
     """
@@ -15,11 +58,14 @@ def validate_discord_id(discord_id: str) -> bool:
     :param discord_id: Discord ID to validate
     :return: True if valid, False otherwise
     """
-    if not discord_id or not isinstance(discord_id, str):
+    if type(discord_id) is not str:
         return False
     
     # Discord IDs are 17-20 digit snowflakes
-    return re.match(r'^\d{17,20}$', discord_id) is not None
+    if not 17 <= len(discord_id) <= 20:
+        return False
+    
+    return discord_id.isascii() and discord_id.isdigit()
 
 
 def validate_user_permissions(user: discord.Member, target_user: discord.Member) -> bool:
@@ -34,15 +80,8 @@ def validate_user_permissions(user: discord.Member, target_user: discord.Member)
     if user.id == target_user.id:
         return True
     
-    # Allow server administrators
-    if user.guild_permissions.administrator:
-        return True
-    
-    # Allow users with manage_messages permission
-    if user.guild_permissions.manage_messages:
-        return True
-    
-    return False
+    # Allow server administrators and users with manage_messages permission
+    return bool(user.guild_permissions.value & _ANALYZE_OTHERS_PERMISSIONS)
 
 
 def validate_cutoff_date(date_str: str) -> tuple[bool, Optional[str]]:
@@ -55,25 +94,51 @@ def validate_cutoff_date(date_str: str) -> tuple[bool, Optional[str]]:
     if not date_str:
         return False, "Date cannot be empty"
     
-    # Check format
-    if not re.match(r'^\d{1,2}\.\d{1,2}\.\d{4}$', date_str):
-        return False, "Date must be in DD.MM.YYYY format"
+    parsed_date, error_message = _parse_cutoff_date(date_str)
+    if error_message:
+        return False, error_message
+    
+    # Check if date is not in the future; kept out of the cache since it
+    # depends on the current time
+    if parsed_date > _now():
+        return False, "Cutoff date cannot be in the future"
+    
+    return True, None
+
+
+@lru_cache(maxsize=4096)
+def _parse_cutoff_date(date_str: str) -> tuple[Optional[datetime], Optional[str]]:
+    """
+    Parse a DD.MM.YYYY cutoff date and apply the time-independent checks.
+    
+    :param date_str: Non-empty date string
+    :return: Tuple of (parsed_date, error_message)
+    """
+    # Check format; DD.MM.YYYY is 8-10 ASCII characters
+    if len(date_str) < 8 or len(date_str) > 10 or not date_str.isascii():
+        return None, "Date must be in DD.MM.YYYY format"
+    
+    parts = date_str.split('.')
+    if len(parts) != 3:
+        return None, "Date must be in DD.MM.YYYY format"
+    
+    day, month, year = parts
+    if not (
+        1 <= len(day) <= 2 and 1 <= len(month) <= 2 and len(year) == 4
+        and day.isdigit() and month.isdigit() and year.isdigit()
+    ):
+        return None, "Date must be in DD.MM.YYYY format"
     
     try:
-        parsed_date = datetime.strptime(date_str, "%d.%m.%Y")
+        parsed_date = datetime(int(year), int(month), int(day))
     except ValueError:
-        return False, "Invalid date values"
-    
-    # Check if date is not in the future
-    if parsed_date > datetime.now():
-        return False, "Cutoff date cannot be in the future"
+        return None, "Invalid date values"
     
     # Check if date is not too far in the past (optional limit)
-    min_date = datetime(2015, 1, 1)  # Discord's launch year
-    if parsed_date < min_date:
-        return False, "Cutoff date cannot be before 2015"
+    if parsed_date < _MIN_DATE:
+        return None, "Cutoff date cannot be before 2015"
     
-    return True, None
+    return parsed_date, None
 
 
 def validate_session_limits(server_id: str, current_sessions: int, max_sessions: int) -> tuple[bool, Optional[str]]:
@@ -86,7 +151,7 @@ def validate_session_limits(server_id: str, current_sessions: int, max_sessions:
     :return: Tuple of (is_valid, error_message)
     """
     if current_sessions >= max_sessions:
-        return False, f"Maximum number of active sessions ({max_sessions}) reached for this server"
+        return False, _SESSION_LIMIT_ERROR.format(max_sessions)
     
     return True, None
 
@@ -98,25 +163,30 @@ def validate_message_content_for_training(content: str) -> tuple[bool, Optional[
     :param content: Message content to validate
     :return: Tuple of (is_valid, error_message)
     """
-    if not content or len(content.strip()) == 0:
+    if not content:
+        return False, "Empty message content"
+    
+    # Check maximum length before scanning anything
+    length = len(content)
+    if length > 2000:
+        return False, "Message too long"
+    
+    stripped_length = len(content.strip())
+    if stripped_length == 0:
         return False, "Empty message content"
     
     # Check minimum length
-    if len(content.strip()) < 3:
+    if stripped_length < 3:
         return False, "Message too short for training"
     
-    # Check maximum length
-    if len(content) > 2000:
-        return False, "Message too long"
-    
-    # Check if mostly special characters
-    alphanumeric_count = len(re.sub(r'[^\w\s]', '', content))
-    if alphanumeric_count < len(content) * 0.3:
+    # Check if mostly special characters (under 30% word/space characters)
+    if count_word_chars(content) * 10 < length * 3:
         return False, "Message contains too many special characters"
     
     return True, None
 
 
+@lru_cache(maxsize=4096)
 def validate_model_name(model_name: str) -> tuple[bool, Optional[str]]:
     """
     Validate AI model name.
@@ -127,13 +197,18 @@ def validate_model_name(model_name: str) -> tuple[bool, Optional[str]]:
     if not model_name:
         return False, "Model name cannot be empty"
     
-    # Basic validation for model name format
-    if not re.match(r'^[a-zA-Z0-9][a-zA-Z0-9._-]*[a-zA-Z0-9]$', model_name):
-        return False, "Invalid model name format"
-    
     if len(model_name) > 100:
         return False, "Model name too long"
     
+    # Basic validation for model name format (at least two characters)
+    if (
+        len(model_name) < 2
+        or model_name[0] not in _MODEL_NAME_EDGE_CHARS
+        or model_name[-1] not in _MODEL_NAME_EDGE_CHARS
+        or not _MODEL_NAME_BODY_CHARS.issuperset(model_name[1:-1])
+    ):
+        return False, "Invalid model name format"
+    
     return True, None
 
 
@@ -147,20 +222,17 @@ def validate_channel_permissions(channel: discord.TextChannel, bot_user: discord
     """
     permissions = channel.permissions_for(bot_user)
     
-    required_permissions = [
-        ('read_messages', 'Read Messages'),
-        ('send_messages', 'Send Messages'),
-        ('read_message_history', 'Read Message History'),
-        ('embed_links', 'Embed Links')
-    ]
+    # Fast path: every required bit is set
+    if not _REQUIRED_CHANNEL_PERMISSIONS & ~permissions.value:
+        return True, None
     
-    missing_permissions = []
-    for perm_name, perm_display in required_permissions:
-        if not getattr(permissions, perm_name):
-            missing_permissions.append(perm_display)
+    missing_permissions = [
+        name for attr, name in _REQUIRED_CHANNEL_PERMISSION_NAMES
+        if not getattr(permissions, attr)
+    ]
     
     if missing_permissions:
-        return False, f"Missing permissions: {', '.join(missing_permissions)}"
+        return False, "Missing permissions: " + _join_names(missing_permissions)
     
     return True, None
 
@@ -175,14 +247,15 @@ def validate_training_dataset_size(message_count: int, min_messages: int = 50, m
     :return: Tuple of (is_valid, error_message)
     """
     if message_count < min_messages:
-        return False, f"Insufficient messages for training. Found {message_count}, need at least {min_messages}"
+        return False, _TOO_FEW_MESSAGES_ERROR.format(message_count, min_messages)
     
     if message_count > max_messages:
-        return False, f"Too many messages for training. Found {message_count}, maximum is {max_messages}"
+        return False, _TOO_MANY_MESSAGES_ERROR.format(message_count, max_messages)
     
     return True, None
 
 
+@lru_cache(maxsize=4096)
 def sanitize_filename(filename: str) -> str:
     """
     Sanitize filename for safe file system use.
@@ -190,18 +263,6 @@ def sanitize_filename(filename: str) -> str:
     :param filename: Original filename
     :return: Sanitized filename
     """
-    # Remove or replace invalid characters
-    sanitized = re.sub(r'[<>:"/\\|?*]', '_', filename)
-    
-    # Remove leading/trailing whitespace and dots
-    sanitized = sanitized.strip('. ')
-    
-    # Ensure filename is not empty
-    if not sanitized:
-        sanitized = "untitled"
-    
-    # Limit length
-    if len(sanitized) > 255:
-        sanitized = sanitized[:255]
-    
-    return sanitized
\ No newline at end of file
+    # Replace invalid characters, remove leading/trailing whitespace and dots,
+    # limit length and ensure the filename is not empty
+    return filename.translate(_FILENAME_TRANS).strip('. ')[:255] or "untitled"
\ No newline at end of file